@@ -1,5 +1,8 @@
 # app/routes/routes.py
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from db.database import get_db
@@ -10,13 +13,18 @@ from schemas.schemas import (
     TrendsResponse,
     DashboardOverview,
     PaginatedResponse,
-    PaginatedTrendsResponse
+    PaginatedTrendsResponse,
+    SessionsResponse,
+    FunnelResponse,
+    TopResponse,
 )
 from services import (
     activity_service,
     analytics_service,
     dashboard_service,
     health_service,
+    session_service,
+    topk_service,
 )
 
 router = APIRouter()
@@ -73,24 +81,31 @@ def health_check():
     summary="Track User Activity",
     description="Creates and stores a new activity record in the database. This endpoint records user actions for analytics and history purposes."
 )
-def track_activity(payload: TrackActivityRequest, db: Session = Depends(get_db)):
+def track_activity(payload: TrackActivityRequest, response: Response, db: Session = Depends(get_db)):
     """
     Track a new user activity.
     
     Creates and stores a new activity record in the database.
     This endpoint records user actions for analytics and history purposes.
+    Retries that reuse an idempotency_key do not create a second record;
+    the original record is returned with status 200 instead.
     
     Args:
         payload (TrackActivityRequest): Activity data including user_id, activity_type, and metadata.
+        response (Response): Outgoing response, used to report replayed requests.
         db (Session): Database session dependency.
     
     Returns:
-        ActivityResponse: The created activity record with id, timestamp, and all details.
+        ActivityResponse: The created (or previously stored) activity record with id, timestamp, and all details.
     
     Raises:
         HTTPException: If the activity data is invalid or database operation fails.
     """
-    activity = activity_service.track_activity(db, payload)
+    try:
+        activity = activity_service.track_activity(db, payload)
+    except activity_service.DuplicateActivityError as dup:
+        response.status_code = 200
+        return dup.activity
     return activity
 
 
@@ -139,14 +154,19 @@ def get_user(
     summary="Analytics Summary",
     description="Provides high-level statistics about all activities in the system, including total counts, user metrics, and activity type breakdowns."
 )
-def analytics_summary(db: Session = Depends(get_db)):
+def analytics_summary(
+    exact: bool = Query(False, description="Compute top pages with an exact scan instead of sketches (for audits)"),
+    db: Session = Depends(get_db),
+):
     """
     Get overall analytics summary.
     
     Provides high-level statistics about all activities in the system,
     including total counts, user metrics, and activity type breakdowns.
+    Top pages are served from the heavy-hitter sketch unless exact is set.
     
     Args:
+        exact (bool): Compute top pages with a full scan. Defaults to False.
         db (Session): Database session dependency.
     
     Returns:
@@ -155,7 +175,7 @@ def analytics_summary(db: Session = Depends(get_db)):
     Raises:
         HTTPException: If database query fails.
     """
-    return analytics_service.get_summary(db)
+    return analytics_service.get_summary(db, exact=exact)
 
 
 @router.get(
@@ -193,6 +213,127 @@ def analytics_trends(
     return paginate(analytics_service.get_trends, db, page, limit, days=days)
 
 
+@router.get(
+    "/analytics/sessions",
+    response_model=SessionsResponse,
+    tags=["Analytics"],
+    summary="Analytics Sessions",
+    description="Groups each user's activities into sessions split by an inactivity gap and reports session counts, durations and sizes for a time range."
+)
+def analytics_sessions(
+    start: Optional[datetime] = Query(None, description="Range start (inclusive). Defaults to 7 days before end"),
+    end: Optional[datetime] = Query(None, description="Range end (exclusive). Defaults to now"),
+    gap_minutes: int = Query(30, ge=1, le=1440, description="Inactivity gap that closes a session, in minutes (1-1440)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve session statistics over a time range.
+    
+    Groups each user's activities into sessions, starting a new session
+    whenever the gap between consecutive events exceeds gap_minutes.
+    Results for closed time ranges are cached.
+    
+    Args:
+        start (datetime, optional): Range start (inclusive). Defaults to 7 days before end.
+        end (datetime, optional): Range end (exclusive). Defaults to now.
+        gap_minutes (int): Inactivity gap in minutes. Defaults to 30.
+        db (Session): Database session dependency.
+    
+    Returns:
+        SessionsResponse: Session count, unique users, average duration and events per session.
+    
+    Raises:
+        HTTPException: If the parameters are invalid or database query fails.
+    """
+    try:
+        return session_service.get_sessions(db, start=start, end=end, gap_minutes=gap_minutes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/analytics/funnel",
+    response_model=FunnelResponse,
+    tags=["Analytics"],
+    summary="Analytics Funnel",
+    description="Computes ordered step conversion (e.g. page_view → click → purchase) across user sessions for a time range."
+)
+def analytics_funnel(
+    steps: List[str] = Query(..., min_length=1, description="Ordered event types, e.g. steps=page_view&steps=click&steps=purchase"),
+    start: Optional[datetime] = Query(None, description="Range start (inclusive). Defaults to 7 days before end"),
+    end: Optional[datetime] = Query(None, description="Range end (exclusive). Defaults to now"),
+    gap_minutes: int = Query(30, ge=1, le=1440, description="Inactivity gap that closes a session, in minutes (1-1440)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve ordered funnel conversion over a time range.
+    
+    A session reaches a step when an event of that type occurs after the
+    previous step was reached within the same session. Results for closed
+    time ranges are cached.
+    
+    Args:
+        steps (List[str]): Ordered event types that make up the funnel.
+        start (datetime, optional): Range start (inclusive). Defaults to 7 days before end.
+        end (datetime, optional): Range end (exclusive). Defaults to now.
+        gap_minutes (int): Inactivity gap in minutes. Defaults to 30.
+        db (Session): Database session dependency.
+    
+    Returns:
+        FunnelResponse: Per-step session counts with overall and step-to-step conversion rates.
+    
+    Raises:
+        HTTPException: If the parameters are invalid or database query fails.
+    """
+    try:
+        return session_service.get_funnel(db, steps, start=start, end=end, gap_minutes=gap_minutes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/analytics/top",
+    response_model=TopResponse,
+    tags=["Analytics"],
+    summary="Analytics Top-K",
+    description="Returns the most frequent pages, event types or users for a time window, answered from hourly heavy-hitter sketches or, for audits, from an exact scan."
+)
+def analytics_top(
+    dimension: Literal["page", "event_type", "user"] = Query("page", description="What to rank: page, event_type or user"),
+    start: Optional[datetime] = Query(None, description="Window start (inclusive). Defaults to 7 days before end"),
+    end: Optional[datetime] = Query(None, description="Window end (exclusive). Defaults to now"),
+    k: int = Query(10, ge=1, le=50, description="Number of items to return (1-50)"),
+    exact: bool = Query(False, description="Use an exact GROUP BY scan instead of sketches (for audits)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve the top-k items of a dimension for a time window.
+    
+    Sketch mode merges per-hour Space-Saving summaries maintained on ingest,
+    so the window is widened to whole hours and each count is an upper bound
+    that exceeds the true value by at most `error`. Exact mode scans
+    activities and returns true counts.
+    
+    Args:
+        dimension (str): One of page, event_type or user. Defaults to page.
+        start (datetime, optional): Window start (inclusive). Defaults to 7 days before end.
+        end (datetime, optional): Window end (exclusive). Defaults to now.
+        k (int): Number of items to return (1-50). Defaults to 10.
+        exact (bool): Run an exact scan instead of using sketches. Defaults to False.
+        db (Session): Database session dependency.
+    
+    Returns:
+        TopResponse: Ranked items with count, error bound and last seen time.
+    
+    Raises:
+        HTTPException: If the parameters are invalid or database query fails.
+    """
+    try:
+        return topk_service.get_top(db, dimension, start=start, end=end, k=k, exact=exact)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ────────────────────────────────
 # 📈 Dashboard Endpoints
 # ────────────────────────────────
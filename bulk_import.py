@@ -0,0 +1,75 @@
+# app/bulk_import.py
+"""
+Offline bulk import of historical activities.
+
+Usage:
+    python bulk_import.py events-2024-*.ndjson --workers 4
+    python bulk_import.py backfill.csv --drop-indexes --chunk-rows 100000
+
+Stop the API before running it and start it again afterwards. The load
+tunes SQLite pragmas and may drop secondary indexes, and a running API keeps
+its top-k sketches and cached closed ranges in memory, so it would never
+see the imported rows.
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine
+
+from db.database import DATABASE_URL, init_db
+from services import import_service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bulk load NDJSON/CSV files into activities",
+        epilog="The API must be stopped during the import and restarted afterwards: "
+               "its in-memory sketches and caches do not see rows loaded by this tool.",
+    )
+    parser.add_argument("files", nargs="+", help="NDJSON (.ndjson/.jsonl) or CSV files")
+    parser.add_argument("--database", default=DATABASE_URL, help=f"Database URL (default: {DATABASE_URL})")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="Input format (default: from file extension)")
+    parser.add_argument("--chunk-rows", type=int, default=import_service.DEFAULT_CHUNK_ROWS, help="Rows per insert transaction")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    indexes = parser.add_mutually_exclusive_group()
+    indexes.add_argument("--drop-indexes", dest="drop_indexes", action="store_true", default=None,
+                         help="Drop secondary indexes during the load (default: only for files >= 256 MB)")
+    indexes.add_argument("--keep-indexes", dest="drop_indexes", action="store_false")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved checkpoints and load from the start")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database)
+    init_db(engine)
+
+    def progress(offset, size, stats):
+        print(f"\r  {offset / size:6.1%}  inserted={stats['inserted']:,}  rejected={stats['rejected']:,}", end="", flush=True)
+
+    started = time.perf_counter()
+    for path in args.files:
+        print(f"📥 {path}")
+        try:
+            stats = import_service.import_file(
+                engine,
+                path,
+                fmt=args.format,
+                chunk_rows=args.chunk_rows,
+                workers=args.workers,
+                drop_indexes=args.drop_indexes,
+                restart=args.restart,
+                progress=progress,
+            )
+        except ValueError as e:
+            print(f"  ❌ {e}", file=sys.stderr)
+            return 1
+        print(f"\n  ✅ inserted={stats['inserted']:,} skipped_duplicates={stats['skipped']:,} "
+              f"rejected={stats['rejected']:,} total_from_file={stats['rows']:,}")
+
+    import_service.refresh_derived(engine)
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
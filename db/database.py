@@ -1,6 +1,9 @@
 # app/database/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+
+from utils.load_monitor import load_monitor
 
 # ✅ Hardcoded SQLite DB URL
 DATABASE_URL = "sqlite:///./activity.db"
@@ -14,16 +17,43 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
-def init_db():
+def init_db(bind=engine):
     # ✅ Corrected model import
-    from db.models import Activity
-    Base.metadata.create_all(bind=engine)
+    from db.models import Activity, ImportCheckpoint
+    Base.metadata.create_all(bind=bind)
+    _add_missing_columns(bind)
+
+
+def _add_missing_columns(bind):
+    # create_all() never alters existing tables, so columns added after the
+    # first deploy are patched in here
+    added = {
+        ("activities", "idempotency_key"): "VARCHAR",
+        ("import_checkpoints", "fingerprint"): "VARCHAR",
+    }
+    inspector = inspect(bind)
+    existing = {
+        table: {c["name"] for c in inspector.get_columns(table)}
+        for table in {t for t, _ in added}
+    }
+    with bind.begin() as conn:
+        for (table, column), ddl_type in added.items():
+            if column not in existing[table]:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_activities_idempotency_key "
+            "ON activities (idempotency_key)"
+        ))
 
 
 # ✅ DB dependency for FastAPI routes
 def get_db():
     db = SessionLocal()
     try:
+        # Check out the connection up front so pool wait time feeds load shedding
+        started = time.perf_counter()
+        db.connection()
+        load_monitor.record_pool_wait(time.perf_counter() - started)
         yield db
     finally:
         db.close()
@@ -12,4 +12,14 @@ class Activity(Base):
     payload = Column(Text, nullable=True)  # JSON stored as string
     page = Column(String, index=True, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    idempotency_key = Column(String, unique=True, index=True, nullable=True)  # client retry dedup
 
+
+class ImportCheckpoint(Base):
+    __tablename__ = "import_checkpoints"
+
+    source = Column(String, primary_key=True)  # absolute path of the imported file
+    byte_offset = Column(Integer, nullable=False, default=0)
+    rows = Column(Integer, nullable=False, default=0)
+    fingerprint = Column(String, nullable=True)  # see import_service.fingerprint
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
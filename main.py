@@ -2,9 +2,14 @@
 from fastapi import FastAPI
 from db.database import init_db
 from  api.routes import router
+from api.middleware import RateLimitMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 app = FastAPI(title="Activity Analytics API")
 
+# ---- RATE LIMITING / LOAD SHEDDING ----
+# Added before CORS so 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 # ---- CORS SETTINGS ----
 app.add_middleware(
     CORSMiddleware,
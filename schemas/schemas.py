@@ -13,6 +13,7 @@ class TrackActivityRequest(BaseModel):
     page: Optional[str] = Field(None, example="/home")
     payload: Optional[dict] = Field(None, example={"action": "click"})
     timestamp: Optional[datetime] = Field(None)
+    idempotency_key: Optional[str] = Field(None, max_length=128, example="3f2c9a1e-retry-safe")
 
 
 # ------------------------
@@ -71,6 +72,47 @@ class TrendsResponse(BaseModel):
     trends: List[TrendPoint]
 
 
+class SessionsResponse(BaseModel):
+    start: datetime
+    end: datetime
+    gap_minutes: int
+    total_sessions: int
+    unique_users: int
+    avg_session_seconds: float
+    avg_events_per_session: float
+
+
+class FunnelStep(BaseModel):
+    step: int
+    event_type: str
+    sessions: int
+    conversion_rate: float
+    step_conversion: float
+
+
+class FunnelResponse(BaseModel):
+    start: datetime
+    end: datetime
+    gap_minutes: int
+    total_sessions: int
+    steps: List[FunnelStep]
+
+
+class TopItem(BaseModel):
+    key: str
+    count: int
+    error: int
+    last_seen: Optional[datetime]
+
+
+class TopResponse(BaseModel):
+    dimension: str
+    start: datetime
+    end: datetime
+    exact: bool
+    items: List[TopItem]
+
+
 # ------------------------
 # Dashboard Schemas
 # ------------------------
@@ -1,16 +1,47 @@
 # services/activity_service.py
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from db.models import Activity
 from schemas.schemas import TrackActivityRequest
+from services.session_service import invalidate_range_cache
+from services.topk_service import record_activity
+from utils.bloom import RotatingBloomFilter
 from datetime import datetime
 import json
 
+# Idempotency keys seen in the last 1-2 hours. A miss means the key is new
+# and the insert goes straight through; a hit is confirmed against the
+# unique index before the request is treated as a retry.
+_recent_keys = RotatingBloomFilter(capacity=100_000, error_rate=0.01, rotate_seconds=3600)
+
+
+class DuplicateActivityError(Exception):
+    """
+    Raised when an idempotency key was already used; carries the stored row.
+    """
+
+    def __init__(self, activity: Activity):
+        super().__init__(f"Duplicate idempotency key: {activity.idempotency_key}")
+        self.activity = activity
+
+
+def _find_by_key(db: Session, key: str):
+    return db.query(Activity).filter(Activity.idempotency_key == key).first()
+
 
 def track_activity(db: Session, payload: TrackActivityRequest):
     """
     Insert a new activity record into the database.
+
+    Raises DuplicateActivityError if `idempotency_key` was already stored.
     """
+    key = payload.idempotency_key
+    if key is not None and key in _recent_keys:
+        existing = _find_by_key(db, key)
+        if existing is not None:
+            raise DuplicateActivityError(existing)
+
     # Ensure payload is always a JSON string
     payload_data = payload.payload
     if isinstance(payload_data, dict):
@@ -21,12 +52,29 @@ def track_activity(db: Session, payload: TrackActivityRequest):
         event_type=payload.event_type,
         page=payload.page,
         payload=payload_data,
-        created_at=payload.timestamp or datetime.utcnow()
+        created_at=payload.timestamp or datetime.utcnow(),
+        idempotency_key=key,
     )
 
     db.add(new_activity)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Key older than the filter window (or inserted by another worker)
+        db.rollback()
+        existing = _find_by_key(db, key) if key is not None else None
+        if existing is None:
+            raise
+        _recent_keys.add(key)
+        raise DuplicateActivityError(existing)
     db.refresh(new_activity)
+    if key is not None:
+        _recent_keys.add(key)
+    record_activity(db, new_activity)
+
+    # Backdated events may land inside an already cached closed range
+    if payload.timestamp is not None:
+        invalidate_range_cache(new_activity.created_at)
     return new_activity
 
 
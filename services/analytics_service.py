@@ -4,9 +4,16 @@ from datetime import datetime, timedelta
 
 from db.models import Activity
 from schemas.schemas import TrendsResponse, SummaryResponse
+from services import topk_service
 
 
-def get_summary(db: Session) -> SummaryResponse:
+def get_summary(db: Session, exact: bool = False) -> SummaryResponse:
+    """
+    Overall totals and top pages.
+
+    Top pages come from the all-time heavy-hitter sketch; `exact=True`
+    runs the full GROUP BY over activities instead (for audits).
+    """
     total_activities = db.query(func.count(Activity.id)).scalar() or 0
     unique_users = db.query(func.count(func.distinct(Activity.user_id))).scalar() or 0
 
@@ -19,15 +26,21 @@ def get_summary(db: Session) -> SummaryResponse:
     by_event = {t[0]: t[1] for t in by_event_tuples}
 
     # top pages (exclude NULL)
-    top_pages_q = (
-        db.query(Activity.page, func.count(Activity.id).label("cnt"))
-        .filter(Activity.page != None)
-        .group_by(Activity.page)
-        .order_by(desc("cnt"))
-        .limit(10)
-        .all()
-    )
-    top_pages = [{"page": row[0], "count": row[1]} for row in top_pages_q]
+    if exact:
+        top_pages_q = (
+            db.query(Activity.page, func.count(Activity.id).label("cnt"))
+            .filter(Activity.page != None)
+            .group_by(Activity.page)
+            .order_by(desc("cnt"))
+            .limit(10)
+            .all()
+        )
+        top_pages = [{"page": row[0], "count": row[1]} for row in top_pages_q]
+    else:
+        top_pages = [
+            {"page": item["key"], "count": item["count"]}
+            for item in topk_service.get_top_all_time(db, "page", k=10)
+        ]
 
     return {
         "total_activities": total_activities,
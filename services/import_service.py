@@ -0,0 +1,291 @@
+# services/import_service.py
+import csv
+import hashlib
+import json
+import os
+from collections import deque
+from datetime import datetime
+from multiprocessing import Pool
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from db.models import Activity, ImportCheckpoint
+from utils.analytics_utils import to_naive_utc
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Inputs at least this large drop secondary indexes during the load
+AUTO_DROP_INDEX_BYTES = 256 * 1024 * 1024
+
+# Applied to the loading connection only and restored afterwards. The journal
+# stays on disk (WAL) so a crash mid-load cannot corrupt existing data and the
+# checkpoint stays consistent with what was committed.
+LOAD_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "journal_mode": "WAL",
+    "temp_store": "MEMORY",
+    "cache_size": "-262144",  # 256 MB
+}
+
+COLUMNS = ("user_id", "event_type", "page", "payload", "created_at", "idempotency_key")
+
+# Rows go straight to the driver as tuples, so timestamps are pre-rendered
+# (in the parser processes) in the format SQLAlchemy's SQLite DateTime stores
+INSERT_SQL = (
+    f"INSERT OR IGNORE INTO activities ({', '.join(COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in COLUMNS)})"
+)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# Bytes hashed at the start of the file and just before the checkpoint offset
+FINGERPRINT_BLOCK = 4096
+
+
+def detect_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def _parse_timestamp(value):
+    # A backfill must keep the original event time; never default to now
+    if not value:
+        raise ValueError("timestamp is required")
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be an ISO 8601 string")
+    return to_naive_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+def _optional_str(record: dict, field: str):
+    value = record.get(field)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value or None
+
+
+def _to_row(record: dict):
+    """
+    Validate one input record and turn it into an INSERT_SQL tuple.
+
+    Anything that would not bind as a SQLite text value is rejected here,
+    so one bad record can never fail a whole chunk's executemany.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record must be an object")
+    user_id = _optional_str(record, "user_id")
+    event_type = _optional_str(record, "event_type")
+    if not user_id or not event_type:
+        raise ValueError("user_id and event_type are required")
+    payload = record.get("payload")
+    if payload is not None and not isinstance(payload, str):
+        payload = json.dumps(payload)
+    created_at = _parse_timestamp(record.get("timestamp") or record.get("created_at"))
+    return (
+        user_id,
+        event_type,
+        _optional_str(record, "page"),
+        payload or None,
+        created_at.strftime(TIMESTAMP_FORMAT),
+        _optional_str(record, "idempotency_key"),
+    )
+
+
+def parse_chunk(task):
+    """
+    Parse one chunk of raw lines into insertable rows.
+
+    Runs in worker processes, so it takes and returns plain picklable data:
+    (end_offset, fmt, header, lines) -> (end_offset, rows, rejected).
+    """
+    end_offset, fmt, header, lines = task
+    rows, rejected = [], 0
+    if fmt == "csv":
+        try:
+            fieldnames = next(csv.reader([header.decode("utf-8")]))
+        except (ValueError, csv.Error, StopIteration):
+            return end_offset, rows, len(lines)
+
+    # Lines are decoded and parsed one at a time so a bad byte or a
+    # malformed line only rejects that record
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            if fmt == "csv":
+                record = dict(zip(fieldnames, next(csv.reader([line.decode("utf-8")]))))
+            else:
+                record = json.loads(line)
+            rows.append(_to_row(record))
+        except (ValueError, TypeError, csv.Error):
+            rejected += 1
+    return end_offset, rows, rejected
+
+
+def read_chunks(path: str, fmt: str, start_offset: int = 0, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+    """
+    Yield (end_offset, fmt, header, lines) tasks, resuming at `start_offset`.
+
+    Chunks are split on newlines, so CSV fields must not contain line breaks.
+    """
+    with open(path, "rb") as f:
+        header = b""
+        if fmt == "csv":
+            header = f.readline()
+            start_offset = max(start_offset, f.tell())
+        f.seek(start_offset)
+        while True:
+            lines = []
+            for _ in range(chunk_rows):
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line)
+            if not lines:
+                return
+            yield f.tell(), fmt, header, lines
+
+
+def _parse_bounded(pool, tasks, max_in_flight: int):
+    """
+    Like pool.imap(parse_chunk, tasks), but with at most `max_in_flight`
+    chunks submitted and not yet consumed, so parsers cannot run ahead of
+    the single SQLite writer and pile parsed rows up in memory.
+    """
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(parse_chunk, (task,)))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _secondary_indexes():
+    # The unique idempotency index stays in place so deduplication still holds
+    return [idx for idx in Activity.__table__.indexes if not idx.unique]
+
+
+def _set_pragmas(conn, pragmas: dict):
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+    conn.commit()
+    return previous
+
+
+def fingerprint(path: str, offset: int) -> str:
+    """
+    Hash of the first block of the file and the block ending at `offset`.
+
+    Appending to a file keeps its fingerprint for the already-imported
+    prefix; replacing the file with different content changes it.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        digest.update(f.read(min(offset, FINGERPRINT_BLOCK)))
+        f.seek(max(0, offset - FINGERPRINT_BLOCK))
+        digest.update(f.read(offset - f.tell()))
+    return digest.hexdigest()
+
+
+def get_checkpoint(conn, source: str):
+    row = conn.execute(
+        select(ImportCheckpoint.byte_offset, ImportCheckpoint.rows, ImportCheckpoint.fingerprint)
+        .where(ImportCheckpoint.source == source)
+    ).first()
+    return tuple(row) if row else (0, 0, None)
+
+
+def _save_checkpoint(conn, source: str, byte_offset: int, rows: int, file_fingerprint: str):
+    values = {
+        "byte_offset": byte_offset,
+        "rows": rows,
+        "fingerprint": file_fingerprint,
+        "updated_at": datetime.utcnow(),
+    }
+    stmt = sqlite_insert(ImportCheckpoint.__table__).values(source=source, **values)
+    conn.execute(stmt.on_conflict_do_update(index_elements=["source"], set_=values))
+
+
+def import_file(
+    engine,
+    path: str,
+    fmt: str = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    workers: int = 1,
+    drop_indexes: bool = None,
+    restart: bool = False,
+    progress=None,
+):
+    """
+    Bulk load an NDJSON or CSV file into `activities`.
+
+    Each chunk is inserted in one transaction together with its checkpoint,
+    so an interrupted import resumes after the last committed chunk.
+    Rows whose idempotency_key already exists are skipped. Raises
+    ValueError if the file no longer matches its checkpoint.
+    """
+    fmt = fmt or detect_format(path)
+    source = os.path.abspath(path)
+    size = os.path.getsize(path)
+    if drop_indexes is None:
+        drop_indexes = size >= AUTO_DROP_INDEX_BYTES
+
+    stats = {"source": source, "inserted": 0, "rejected": 0, "skipped": 0}
+
+    with engine.connect() as conn:
+        offset, total_rows, saved_fingerprint = (0, 0, None) if restart else get_checkpoint(conn, source)
+        conn.commit()
+        if offset and (size < offset or fingerprint(path, offset) != saved_fingerprint):
+            raise ValueError(
+                f"{source} changed since its checkpoint at byte {offset}; rerun with --restart to load it again"
+            )
+        if offset >= size:
+            stats["rows"] = total_rows
+            return stats
+
+        previous_pragmas = _set_pragmas(conn, LOAD_PRAGMAS)
+        dropped = _secondary_indexes() if drop_indexes else []
+        try:
+            for idx in dropped:
+                idx.drop(conn, checkfirst=True)
+            conn.commit()
+
+            tasks = read_chunks(path, fmt, offset, chunk_rows)
+            pool = Pool(workers) if workers > 1 else None
+            try:
+                parsed = _parse_bounded(pool, tasks, 2 * workers) if pool else map(parse_chunk, tasks)
+                for end_offset, rows, rejected in parsed:
+                    with conn.begin():
+                        inserted = conn.exec_driver_sql(INSERT_SQL, rows).rowcount if rows else 0
+                        total_rows += inserted
+                        _save_checkpoint(conn, source, end_offset, total_rows, fingerprint(path, end_offset))
+                    stats["inserted"] += inserted
+                    stats["skipped"] += len(rows) - inserted
+                    stats["rejected"] += rejected
+                    if progress:
+                        progress(end_offset, size, stats)
+            finally:
+                if pool:
+                    pool.terminate()
+        finally:
+            # Rebuild indexes and restore durability even if the load failed
+            for idx in dropped:
+                idx.create(conn, checkfirst=True)
+            conn.commit()
+            _set_pragmas(conn, previous_pragmas)
+
+    stats["rows"] = total_rows
+    return stats
+
+
+def refresh_derived(engine):
+    """
+    Recompute derived data after a bulk load.
+
+    Refreshes planner statistics. The range cache and top-k sketches live
+    in the API process and are built from the table when it starts serving,
+    which is why imports must run while the API is stopped.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE activities"))
@@ -0,0 +1,234 @@
+# services/session_service.py
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from db.models import Activity
+from utils.analytics_utils import to_naive_utc
+
+DEFAULT_GAP_MINUTES = 30
+DEFAULT_RANGE_DAYS = 7
+
+# Results for closed time ranges never change (unless a backdated event lands
+# inside them, see invalidate_range_cache), so they are cached here. Sync
+# routes run in a threadpool, hence the lock.
+_RANGE_CACHE_SIZE = 256
+_range_cache: "OrderedDict[tuple, object]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _resolve_range(start: Optional[datetime], end: Optional[datetime]):
+    """
+    Fill in default bounds; also report whether the range is cacheable.
+
+    Bounds are normalised to naive UTC. Only a caller-supplied `end` that is
+    already in the past makes a closed range; a defaulted `end=now` is still
+    open and is never cached. Raises ValueError if start >= end.
+    """
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    now = datetime.utcnow()
+    cacheable = end is not None and end <= now
+    end = end or now
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS)
+    if start >= end:
+        raise ValueError("start must be before end")
+    return start, end, cacheable
+
+
+def _cache_key(db: Session, kind: str, start: datetime, end: datetime, *args):
+    return (str(db.get_bind().url), kind, start, end) + args
+
+
+def _cache_get(key):
+    with _cache_lock:
+        value = _range_cache.get(key)
+        if value is not None:
+            _range_cache.move_to_end(key)
+        return value
+
+
+def _cache_put(key, value):
+    with _cache_lock:
+        _range_cache[key] = value
+        _range_cache.move_to_end(key)
+        while len(_range_cache) > _RANGE_CACHE_SIZE:
+            _range_cache.popitem(last=False)
+
+
+def invalidate_range_cache(ts: Optional[datetime] = None):
+    """
+    Drop cached results whose range contains `ts` (or everything if None).
+    """
+    with _cache_lock:
+        if ts is None:
+            _range_cache.clear()
+            return
+        for key in [k for k in _range_cache if k[2] <= ts < k[3]]:
+            del _range_cache[key]
+
+
+def _sessionized(db: Session, start: datetime, end: datetime, gap_minutes: int):
+    """
+    Subquery of in-range activities tagged with a per-user session number.
+
+    A new session starts on a user's first event or whenever the gap to the
+    previous event exceeds `gap_minutes`; a running SUM of those markers over
+    the (user_id, created_at) ordering gives the session number.
+    """
+    order = (Activity.created_at, Activity.id)
+    prev_at = func.lag(Activity.created_at).over(
+        partition_by=Activity.user_id, order_by=order
+    )
+    gap_seconds = (func.julianday(Activity.created_at) - func.julianday(prev_at)) * 86400
+
+    marked = (
+        db.query(
+            Activity.id,
+            Activity.user_id,
+            Activity.event_type,
+            Activity.created_at,
+            case(
+                (prev_at.is_(None), 1),
+                (gap_seconds > gap_minutes * 60, 1),
+                else_=0,
+            ).label("is_new"),
+        )
+        .filter(Activity.created_at >= start, Activity.created_at < end)
+        .subquery()
+    )
+
+    session_no = func.sum(marked.c.is_new).over(
+        partition_by=marked.c.user_id,
+        order_by=(marked.c.created_at, marked.c.id),
+        rows=(None, 0),
+    )
+    return db.query(
+        marked.c.id,
+        marked.c.user_id,
+        marked.c.event_type,
+        marked.c.created_at,
+        session_no.label("session_no"),
+    ).subquery()
+
+
+def get_sessions(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    gap_minutes: int = DEFAULT_GAP_MINUTES,
+):
+    """
+    Session statistics for activities in [start, end).
+    """
+    start, end, cacheable = _resolve_range(start, end)
+    key = _cache_key(db, "sessions", start, end, gap_minutes)
+    if cacheable:
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+    s = _sessionized(db, start, end, gap_minutes)
+    per_session = (
+        db.query(
+            s.c.user_id,
+            func.count().label("events"),
+            (
+                (func.julianday(func.max(s.c.created_at)) - func.julianday(func.min(s.c.created_at)))
+                * 86400
+            ).label("duration"),
+        )
+        .group_by(s.c.user_id, s.c.session_no)
+        .subquery()
+    )
+    total, users, avg_duration, avg_events = db.query(
+        func.count(),
+        func.count(func.distinct(per_session.c.user_id)),
+        func.avg(per_session.c.duration),
+        func.avg(per_session.c.events),
+    ).one()
+
+    result = {
+        "start": start,
+        "end": end,
+        "gap_minutes": gap_minutes,
+        "total_sessions": total or 0,
+        "unique_users": users or 0,
+        "avg_session_seconds": round(avg_duration or 0.0, 3),
+        "avg_events_per_session": round(avg_events or 0.0, 3),
+    }
+    if cacheable:
+        _cache_put(key, result)
+    return result
+
+
+def get_funnel(
+    db: Session,
+    steps: List[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    gap_minutes: int = DEFAULT_GAP_MINUTES,
+):
+    """
+    Ordered funnel conversion over sessions in [start, end).
+
+    A session reaches step N when an event of steps[N] occurs after it has
+    reached step N-1. Rows are streamed once in (user_id, created_at) order,
+    keeping only the current session's step pointer in memory.
+    """
+    start, end, cacheable = _resolve_range(start, end)
+    key = _cache_key(db, "funnel", start, end, gap_minutes, tuple(steps))
+    if cacheable:
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+    s = _sessionized(db, start, end, gap_minutes)
+    # Every in-range row is read (not just step events) so session
+    # boundaries are counted in the same pass.
+    rows = (
+        db.query(s.c.user_id, s.c.session_no, s.c.event_type)
+        .order_by(s.c.user_id, s.c.created_at, s.c.id)
+        .yield_per(1000)
+    )
+
+    total_sessions = 0
+    reached = [0] * len(steps)
+    current = None
+    pointer = 0
+    for user_id, session_no, event_type in rows:
+        if (user_id, session_no) != current:
+            for i in range(pointer):
+                reached[i] += 1
+            total_sessions += 1
+            current = (user_id, session_no)
+            pointer = 0
+        if pointer < len(steps) and event_type == steps[pointer]:
+            pointer += 1
+    for i in range(pointer):
+        reached[i] += 1
+
+    items = []
+    for i, event_type in enumerate(steps):
+        prev = reached[i - 1] if i else total_sessions
+        items.append({
+            "step": i + 1,
+            "event_type": event_type,
+            "sessions": reached[i],
+            "conversion_rate": round(reached[i] / total_sessions, 4) if total_sessions else 0.0,
+            "step_conversion": round(reached[i] / prev, 4) if prev else 0.0,
+        })
+
+    result = {
+        "start": start,
+        "end": end,
+        "gap_minutes": gap_minutes,
+        "total_sessions": total_sessions,
+        "steps": items,
+    }
+    if cacheable:
+        _cache_put(key, result)
+    return result
@@ -0,0 +1,291 @@
+# services/topk_service.py
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import desc, func
+from sqlalchemy.orm import Session
+
+from db.models import Activity
+from utils.analytics_utils import to_naive_utc
+from utils.heavy_hitters import SpaceSaving
+
+BUCKET = timedelta(hours=1)
+SKETCH_CAPACITY = 64
+DEFAULT_RANGE_DAYS = 7
+
+# Buckets kept in memory per (database, dimension). Sketches live only in
+# process memory: a cold process (or another worker) rebuilds the buckets a
+# window touches with one grouped scan of that span, after which the window
+# is answered from memory. Windows are capped at this many buckets so a
+# window never evicts its own buckets and rescans on every call.
+_MAX_BUCKETS = 24 * 120
+
+DIMENSIONS = {
+    "page": Activity.page,
+    "event_type": Activity.event_type,
+    "user": Activity.user_id,
+}
+
+# (db url, dimension) -> OrderedDict[bucket_start, SpaceSaving]
+_buckets = {}
+# (db url, dimension) -> SpaceSaving over all time
+_totals = {}
+# (db url, dimension, bucket_start or None for totals) -> [hydrations, deltas]
+# Rows ingested while a sketch is being built from the table are logged here
+# as (id, value, created_at) and replayed if the scan did not see them.
+_pending = {}
+# Sync routes run in a threadpool: every read or write of the stores and of
+# the sketches inside them happens under this lock. DB queries run outside it.
+_lock = threading.Lock()
+
+
+def reset():
+    """
+    Drop every in-memory sketch.
+    """
+    with _lock:
+        _buckets.clear()
+        _totals.clear()
+
+
+def _url(db: Session) -> str:
+    return str(db.get_bind().url)
+
+
+def _store(db: Session, dimension: str) -> OrderedDict:
+    return _buckets.setdefault((_url(db), dimension), OrderedDict())
+
+
+def _bucket_start(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _put(store: OrderedDict, bucket: datetime, sketch: SpaceSaving):
+    store[bucket] = sketch
+    store.move_to_end(bucket)
+    while len(store) > _MAX_BUCKETS:
+        store.popitem(last=False)
+
+
+def record_activity(db: Session, activity: Activity):
+    """
+    Fold a freshly inserted activity into the sketches it belongs to.
+
+    Sketches that are not loaded are skipped (they are built from the table,
+    including this row, when first queried); sketches being built right now
+    get the row through their pending log.
+    """
+    url = _url(db)
+    bucket = _bucket_start(activity.created_at)
+    with _lock:
+        for dimension, column in DIMENSIONS.items():
+            value = getattr(activity, column.key)
+            if value is None:
+                continue
+            targets = (
+                (_buckets.get((url, dimension), {}).get(bucket), (url, dimension, bucket)),
+                (_totals.get((url, dimension)), (url, dimension, None)),
+            )
+            for sketch, pending_key in targets:
+                if sketch is not None:
+                    sketch.update(value, 1, activity.created_at)
+                elif pending_key in _pending:
+                    _pending[pending_key][1].append((activity.id, value, activity.created_at))
+
+
+def _begin_pending(keys):
+    for key in keys:
+        _pending.setdefault(key, [0, []])[0] += 1
+
+
+def _end_pending(keys):
+    for key in keys:
+        entry = _pending[key]
+        entry[0] -= 1
+        if entry[0] == 0:
+            del _pending[key]
+
+
+def _replay(sketch: SpaceSaving, key, max_id: int) -> SpaceSaving:
+    for activity_id, value, created_at in _pending[key][1]:
+        if activity_id > max_id:
+            sketch.update(value, 1, created_at)
+    return sketch
+
+
+def _hydrate(db: Session, dimension: str, missing: list):
+    """
+    Build sketches for `missing` buckets with one grouped scan of their span.
+
+    Only rows up to the current max id are scanned. Every later row is
+    committed after the pending log was opened, so record_activity logs it
+    and _replay adds it exactly once. Returns (sketches, max_id).
+    """
+    column = DIMENSIONS[dimension]
+    max_id = db.query(func.max(Activity.id)).scalar() or 0
+    bucket_col = func.strftime("%Y-%m-%d %H:00:00", Activity.created_at).label("bucket")
+    cnt = func.count(Activity.id).label("cnt")
+    rows = (
+        db.query(bucket_col, column, cnt, func.max(Activity.created_at))
+        .filter(
+            Activity.created_at >= missing[0],
+            Activity.created_at < missing[-1] + BUCKET,
+            Activity.id <= max_id,
+            column != None,
+        )
+        .group_by("bucket", column)
+        # Largest counts first keeps Space-Saving errors minimal
+        .order_by("bucket", desc("cnt"))
+        .all()
+    )
+
+    fresh = {b: SpaceSaving(SKETCH_CAPACITY) for b in missing}
+    for bucket, value, count, last_seen in rows:
+        sketch = fresh.get(datetime.strptime(bucket, "%Y-%m-%d %H:%M:%S"))
+        if sketch is not None:
+            sketch.update(value, count, last_seen)
+    return fresh, max_id
+
+
+def _window_sketch(db: Session, dimension: str, start: datetime, end: datetime) -> SpaceSaving:
+    url = _url(db)
+    buckets = []
+    b = _bucket_start(start)
+    while b < end:
+        buckets.append(b)
+        b += BUCKET
+
+    window = SpaceSaving(SKETCH_CAPACITY)
+    missing = []
+    with _lock:
+        store = _store(db, dimension)
+        for b in buckets:
+            sketch = store.get(b)
+            if sketch is None:
+                missing.append(b)
+            else:
+                store.move_to_end(b)
+                window = window.merge(sketch)
+        pending_keys = [(url, dimension, b) for b in missing]
+        _begin_pending(pending_keys)
+
+    try:
+        if missing:
+            fresh, max_id = _hydrate(db, dimension, missing)
+            # Merge from the hydrated set itself: the store is an LRU and
+            # must not be read back for buckets this call just inserted.
+            with _lock:
+                store = _store(db, dimension)
+                for b, key in zip(missing, pending_keys):
+                    # Another request may have loaded (and ingest updated) it meanwhile
+                    current = store.get(b)
+                    if current is None:
+                        current = _replay(fresh[b], key, max_id)
+                        _put(store, b, current)
+                    window = window.merge(current)
+    finally:
+        with _lock:
+            _end_pending(pending_keys)
+    return window
+
+
+def get_top_all_time(db: Session, dimension: str = "page", k: int = 10):
+    """
+    Top-k of a dimension over the whole table, from an all-time sketch.
+
+    The sketch is seeded once per process with the exact top SKETCH_CAPACITY
+    counts (every other item is at most the smallest of those, which is the
+    Space-Saving bound) and then kept current by record_activity.
+    """
+    key = (_url(db), dimension)
+    pending_key = key + (None,)
+    with _lock:
+        sketch = _totals.get(key)
+        if sketch is not None:
+            return sketch.top(k)
+        _begin_pending([pending_key])
+
+    try:
+        column = DIMENSIONS[dimension]
+        max_id = db.query(func.max(Activity.id)).scalar() or 0
+        rows = (
+            db.query(column, func.count(Activity.id).label("cnt"), func.max(Activity.created_at))
+            .filter(column != None, Activity.id <= max_id)
+            .group_by(column)
+            .order_by(desc("cnt"))
+            .limit(SKETCH_CAPACITY)
+            .all()
+        )
+        sketch = SpaceSaving(SKETCH_CAPACITY)
+        for value, count, last_seen in rows:
+            sketch.update(value, count, last_seen)
+
+        with _lock:
+            if key not in _totals:
+                _totals[key] = _replay(sketch, pending_key, max_id)
+            return _totals[key].top(k)
+    finally:
+        with _lock:
+            _end_pending([pending_key])
+
+
+def _exact_top(db: Session, dimension: str, start: datetime, end: datetime, k: int):
+    column = DIMENSIONS[dimension]
+    rows = (
+        db.query(column, func.count(Activity.id).label("cnt"), func.max(Activity.created_at).label("last_seen"))
+        .filter(Activity.created_at >= start, Activity.created_at < end, column != None)
+        .group_by(column)
+        .order_by(desc("cnt"), desc("last_seen"))
+        .limit(k)
+        .all()
+    )
+    return [{"key": r[0], "count": r[1], "error": 0, "last_seen": r[2]} for r in rows]
+
+
+def get_top(
+    db: Session,
+    dimension: str = "page",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    k: int = 10,
+    exact: bool = False,
+):
+    """
+    Top-k pages, event types or users for a time window.
+
+    By default the answer comes from hourly Space-Saving sketches, so the
+    window is widened to whole hours (at most _MAX_BUCKETS of them) and
+    counts are upper bounds (within `error`). `exact=True` runs a full
+    GROUP BY over the exact window for audits. Bounds are normalised to
+    naive UTC; raises ValueError for invalid parameters.
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown dimension: {dimension}")
+
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS)
+    if start >= end:
+        raise ValueError("start must be before end")
+
+    if exact:
+        items = _exact_top(db, dimension, start, end, k)
+    else:
+        start = _bucket_start(start)
+        if _bucket_start(end) != end:
+            end = _bucket_start(end) + BUCKET
+        if end - start > BUCKET * _MAX_BUCKETS:
+            raise ValueError(
+                f"Sketch windows are limited to {_MAX_BUCKETS // 24} days; use exact=true for longer ones"
+            )
+        items = _window_sketch(db, dimension, start, end).top(k)
+
+    return {
+        "dimension": dimension,
+        "start": start,
+        "end": end,
+        "exact": exact,
+        "items": items,
+    }
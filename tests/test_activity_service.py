@@ -1,3 +1,4 @@
+import pytest
 from datetime import datetime
 from services import activity_service
 from db.models import Activity
@@ -53,3 +54,23 @@ def test_get_user_activities(db_session):
     assert isinstance(total, int)
     assert all(isinstance(a, Activity) for a in activities)
     assert all(a.user_id == "1" for a in activities)
+
+
+def test_track_activity_idempotency_key(db_session):
+    activity_service._recent_keys.clear()
+    request = TrackActivityRequest(user_id="1", event_type="click", idempotency_key="retry-1")
+
+    first = activity_service.track_activity(db_session, request)
+
+    # Filter hit: confirmed against the table without inserting
+    with pytest.raises(activity_service.DuplicateActivityError) as exc:
+        activity_service.track_activity(db_session, request)
+    assert exc.value.activity.id == first.id
+
+    # Filter miss (e.g. after rotation): unique index still catches it
+    activity_service._recent_keys.clear()
+    with pytest.raises(activity_service.DuplicateActivityError):
+        activity_service.track_activity(db_session, request)
+
+    assert db_session.query(Activity).filter(Activity.idempotency_key == "retry-1").count() == 1
+
@@ -0,0 +1,21 @@
+from utils.bloom import RotatingBloomFilter
+
+
+def test_false_positive_rate_at_capacity():
+    bloom = RotatingBloomFilter(capacity=5000, error_rate=0.01, rotate_seconds=3600)
+    for i in range(5000):
+        bloom.add(f"in-{i}")
+
+    assert all(f"in-{i}" in bloom for i in range(5000))
+    false_positives = sum(f"out-{i}" in bloom for i in range(50_000))
+    assert false_positives / 50_000 < 0.02
+
+
+def test_rotation_forgets_after_two_periods():
+    bloom = RotatingBloomFilter(capacity=1000, error_rate=0.01, rotate_seconds=3600)
+    bloom.add("a")
+    assert "a" in bloom
+
+    bloom.rotate_seconds = 0
+    assert "a" in bloom      # moved to the previous generation
+    assert "a" not in bloom  # dropped on the next rotation
@@ -0,0 +1,110 @@
+import pytest
+import json
+from datetime import datetime
+from sqlalchemy import inspect
+from db.models import Activity
+from services import import_service
+
+
+def _write_ndjson(path, records):
+    with open(path, "a") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+
+
+def test_import_ndjson_resumes_from_checkpoint(db_session, engine, tmp_path):
+    path = tmp_path / "events.ndjson"
+    _write_ndjson(path, [
+        {"user_id": "1", "event_type": "page_view", "page": "/home", "timestamp": "2024-01-01T10:00:00Z"},
+        {"user_id": "2", "event_type": "click", "payload": {"x": 1}, "timestamp": "2024-01-01T10:05:00"},
+        {"user_id": "3"},  # missing event_type
+        {"user_id": "5", "event_type": "click"},  # missing timestamp
+        123, [1, 2], "x",  # valid JSON, but not objects
+    ])
+
+    stats = import_service.import_file(engine, str(path), chunk_rows=2)
+    assert stats["inserted"] == 2 and stats["rejected"] == 5
+
+    # Appended rows are picked up from the saved offset, old ones are not re-read
+    _write_ndjson(path, [{"user_id": "4", "event_type": "purchase", "timestamp": "2024-01-02T00:00:00"}])
+    stats = import_service.import_file(engine, str(path), chunk_rows=2)
+    assert stats["inserted"] == 1 and stats["rows"] == 3
+
+    rows = db_session.query(Activity).order_by(Activity.created_at).all()
+    assert [r.user_id for r in rows] == ["1", "2", "4"]
+    assert rows[0].created_at == datetime(2024, 1, 1, 10, 0, 0)
+    assert json.loads(rows[1].payload) == {"x": 1}
+
+
+def test_import_csv_with_workers_and_dropped_indexes(db_session, engine, tmp_path):
+    path = tmp_path / "events.csv"
+    lines = ["user_id,event_type,page,timestamp,idempotency_key"]
+    lines += [f"{i % 3},page_view,/p{i % 5},2024-01-01T00:{i % 60:02d}:00,k{i % 50}" for i in range(100)]
+    path.write_text("\n".join(lines) + "\n")
+
+    stats = import_service.import_file(engine, str(path), chunk_rows=10, workers=2, drop_indexes=True)
+    assert stats["inserted"] == 50 and stats["skipped"] == 50  # duplicate idempotency keys
+
+    indexes = {idx["name"] for idx in inspect(engine).get_indexes("activities")}
+    assert {"ix_activities_user_id", "ix_activities_created_at"} <= indexes
+    assert db_session.query(Activity).count() == 50
+
+
+def test_parse_bounded_limits_in_flight_chunks():
+    class FakeResult:
+        def __init__(self, value):
+            self.value = value
+
+        def get(self):
+            return self.value
+
+    class FakePool:
+        submitted = 0
+
+        def apply_async(self, func, args):
+            self.submitted += 1
+            return FakeResult(args[0])
+
+    pool = FakePool()
+    consumed = 0
+    for _ in import_service._parse_bounded(pool, iter(range(100)), max_in_flight=4):
+        consumed += 1
+        assert pool.submitted - consumed < 4
+    assert consumed == 100
+
+
+def test_bad_field_types_and_bytes_are_rejected(db_session, engine, tmp_path):
+    path = tmp_path / "events.ndjson"
+    _write_ndjson(path, [
+        {"user_id": "1", "event_type": {"a": 1}, "timestamp": "2024-01-01T00:00:00"},
+        {"user_id": "1", "event_type": "click", "page": ["x"], "timestamp": "2024-01-01T00:00:00"},
+        {"user_id": 7, "event_type": "click", "timestamp": "2024-01-01T00:00:00"},
+        {"user_id": "1", "event_type": "click", "payload": 5, "timestamp": "2024-01-01T00:00:00"},
+    ])
+    stats = import_service.import_file(engine, str(path))
+    assert stats["inserted"] == 1 and stats["rejected"] == 3
+    assert db_session.query(Activity).one().payload == "5"
+
+    csv_path = tmp_path / "events.csv"
+    csv_path.write_bytes(
+        b"user_id,event_type,timestamp\n"
+        b"1,click,2024-01-01T00:00:00\n"
+        b"2,cl\xffick,2024-01-01T00:00:00\n"  # invalid UTF-8
+        b'3,"click,2024-01-01T00:00:00\n'     # unterminated quote
+        b"4,view,2024-01-01T00:00:00\n"
+    )
+    stats = import_service.import_file(engine, str(csv_path), chunk_rows=10)
+    assert stats["inserted"] == 2 and stats["rejected"] == 2
+
+
+def test_replaced_file_does_not_resume(engine, tmp_path):
+    path = tmp_path / "events.ndjson"
+    _write_ndjson(path, [{"user_id": "1", "event_type": "click", "timestamp": "2024-01-01T00:00:00"}])
+    import_service.import_file(engine, str(path))
+
+    path.write_text("")
+    _write_ndjson(path, [{"user_id": "9", "event_type": "view", "timestamp": "2024-02-01T00:00:00"}] * 3)
+    with pytest.raises(ValueError):
+        import_service.import_file(engine, str(path))
+
+    assert import_service.import_file(engine, str(path), restart=True)["inserted"] == 3
@@ -0,0 +1,117 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.middleware import MAX_INGEST_IN_FLIGHT, MAX_POOL_WAIT, RateLimitMiddleware, shed_retry_after
+from utils.load_monitor import LoadMonitor
+from utils.rate_limiter import TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _client(monitor, limits):
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, monitor=monitor, limits=limits)
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    @app.post("/activity/track")
+    def track():
+        return {}
+
+    @app.get("/analytics/summary")
+    def summary():
+        return {}
+
+    @app.get("/activity/user/{user_id}")
+    def user(user_id: str):
+        return {}
+
+    return TestClient(app)
+
+
+def test_token_bucket_refills():
+    limiter = TokenBucketLimiter(rate=1, burst=2)
+    assert limiter.acquire("a", now=0)[0]
+    assert limiter.acquire("a", now=0)[0]
+
+    allowed, retry_after = limiter.acquire("a", now=0)
+    assert not allowed and retry_after == 1
+
+    # Other clients have their own budget
+    assert limiter.acquire("b", now=0)[0]
+    # One second later one token is back
+    assert limiter.acquire("a", now=1)[0]
+
+
+def test_token_bucket_evicts_idle_clients():
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+    for i, key in enumerate(["a", "b", "c"]):
+        limiter.acquire(key, now=i)
+    assert len(limiter) == 2
+
+
+def test_shed_retry_after():
+    monitor = LoadMonitor(alpha=1.0, clock=FakeClock())
+    assert shed_retry_after("analytics", monitor) == 0
+
+    monitor.record_pool_wait(MAX_POOL_WAIT["analytics"] * 2.5)
+    assert shed_retry_after("analytics", monitor) == 3
+
+    monitor.record_pool_wait(0)
+    for _ in range(MAX_INGEST_IN_FLIGHT * 2):
+        monitor.enter("ingest")
+    assert shed_retry_after("ingest", monitor) == 2
+    assert shed_retry_after("default", monitor) == 0
+
+
+def test_pool_wait_decays_without_new_samples():
+    clock = FakeClock()
+    monitor = LoadMonitor(alpha=1.0, half_life=5.0, clock=clock)
+    monitor.record_pool_wait(0.5)
+    assert shed_retry_after("default", monitor) > 0
+
+    # Shed requests never reach get_db, so recovery must come from decay alone
+    clock.now = 30.0
+    assert monitor.pool_wait < 0.01
+    assert shed_retry_after("ingest", monitor) == 0
+    assert shed_retry_after("analytics", monitor) == 0
+
+
+def test_middleware_limits_per_route_class():
+    limits = {"ingest": (0.001, 3), "analytics": (0.001, 2), "default": (0.001, 1)}
+    client = _client(LoadMonitor(clock=FakeClock()), limits)
+
+    assert [client.get("/analytics/summary").status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get("/analytics/summary")
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) >= 1
+
+    # Rotating the API key header does not buy a fresh bucket
+    assert client.get("/analytics/summary", headers={"x-api-key": "other"}).status_code == 429
+
+    # Other route classes have their own budgets; exempt paths are never limited
+    assert [client.post("/activity/track").status_code for _ in range(4)] == [200, 200, 200, 429]
+    assert [client.get("/activity/user/1").status_code for _ in range(2)] == [200, 429]
+    assert all(client.get("/health").status_code == 200 for _ in range(10))
+
+
+def test_middleware_sheds_and_recovers():
+    clock = FakeClock()
+    monitor = LoadMonitor(alpha=1.0, half_life=5.0, clock=clock)
+    client = _client(monitor, {"ingest": (100, 100), "analytics": (100, 100), "default": (100, 100)})
+
+    monitor.record_pool_wait(MAX_POOL_WAIT["ingest"] * 2)
+    response = client.post("/activity/track")
+    assert response.status_code == 429 and response.headers["Retry-After"] == "2"
+    assert client.get("/health").status_code == 200
+
+    clock.now = 60.0
+    assert client.post("/activity/track").status_code == 200
+    assert client.get("/analytics/summary").status_code == 200
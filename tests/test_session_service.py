@@ -0,0 +1,110 @@
+import pytest
+from datetime import datetime, timedelta
+from db.models import Activity
+from services import session_service
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    session_service.invalidate_range_cache()
+    yield
+    session_service.invalidate_range_cache()
+
+
+def _seed(db_session, base):
+    db_session.add_all([
+        # user 1: two sessions (second one starts after a 2h gap)
+        Activity(user_id="1", event_type="page_view", created_at=base),
+        Activity(user_id="1", event_type="click", created_at=base + timedelta(minutes=5)),
+        Activity(user_id="1", event_type="purchase", created_at=base + timedelta(minutes=10)),
+        Activity(user_id="1", event_type="page_view", created_at=base + timedelta(hours=2)),
+        # user 2: click before page_view does not count for the click step
+        Activity(user_id="2", event_type="click", created_at=base),
+        Activity(user_id="2", event_type="page_view", created_at=base + timedelta(minutes=1)),
+    ])
+    db_session.commit()
+
+
+def test_get_sessions(db_session):
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    _seed(db_session, base)
+
+    result = session_service.get_sessions(
+        db_session, start=base, end=base + timedelta(days=1), gap_minutes=30
+    )
+    assert result["total_sessions"] == 3
+    assert result["unique_users"] == 2
+    assert result["avg_events_per_session"] == 2.0
+    assert result["avg_session_seconds"] == pytest.approx((600 + 0 + 60) / 3, abs=0.01)
+
+
+def test_get_funnel(db_session):
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    _seed(db_session, base)
+
+    result = session_service.get_funnel(
+        db_session, ["page_view", "click", "purchase"],
+        start=base, end=base + timedelta(days=1),
+    )
+    assert result["total_sessions"] == 3
+    assert [s["sessions"] for s in result["steps"]] == [3, 1, 1]
+    assert result["steps"][1]["step_conversion"] == pytest.approx(1 / 3, abs=1e-4)
+    assert result["steps"][2]["step_conversion"] == 1.0
+
+
+def test_closed_range_is_cached(db_session):
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    _seed(db_session, base)
+    end = base + timedelta(days=1)
+
+    first = session_service.get_sessions(db_session, start=base, end=end)
+    db_session.add(Activity(user_id="3", event_type="page_view", created_at=base))
+    db_session.commit()
+    assert session_service.get_sessions(db_session, start=base, end=end) is first
+
+    session_service.invalidate_range_cache(base)
+    assert session_service.get_sessions(db_session, start=base, end=end)["total_sessions"] == 4
+
+
+def test_open_range_is_not_cached(db_session):
+    for _ in range(3):
+        session_service.get_sessions(db_session)
+    session_service.get_sessions(db_session, end=datetime.utcnow() + timedelta(hours=1))
+    assert len(session_service._range_cache) == 0
+
+
+def test_aware_bounds_and_invalid_range(db_session):
+    from datetime import timezone
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    _seed(db_session, base)
+
+    aware_end = datetime(2024, 1, 2, 0, 0, 0, tzinfo=timezone.utc)
+    result = session_service.get_sessions(db_session, start=base, end=aware_end)
+    assert result["total_sessions"] == 3 and result["end"].tzinfo is None
+    funnel = session_service.get_funnel(db_session, ["page_view"], end=aware_end)
+    assert funnel["steps"][0]["sessions"] == 3
+
+    with pytest.raises(ValueError):
+        session_service.get_sessions(db_session, start=aware_end, end=base)
+
+
+def test_routes_accept_z_suffixed_bounds():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from api.routes import router
+    from db.database import Base, get_db
+
+    # Routes run in the threadpool, so the DB must be shareable across threads
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: sessionmaker(bind=engine)()
+    client = TestClient(app)
+    assert client.get("/analytics/sessions?end=2024-01-02T00:00:00Z").status_code == 200
+    assert client.get("/analytics/funnel?steps=page_view&end=2024-01-02T00:00:00Z").status_code == 200
+    response = client.get("/analytics/sessions?start=2024-01-03T00:00:00Z&end=2024-01-02T00:00:00Z")
+    assert response.status_code == 400
@@ -0,0 +1,135 @@
+import pytest
+from datetime import datetime, timedelta
+from db.models import Activity
+from schemas.schemas import TrackActivityRequest
+from services import activity_service, topk_service
+from utils.heavy_hitters import SpaceSaving
+
+
+@pytest.fixture(autouse=True)
+def reset_sketches():
+    topk_service.reset()
+    yield
+    topk_service.reset()
+
+
+def test_space_saving_merge():
+    a, b = SpaceSaving(2), SpaceSaving(2)
+    for item in ["x", "x", "x", "y"]:
+        a.update(item)
+    for item in ["x", "z", "z"]:
+        b.update(item)
+
+    merged = a.merge(b)
+    top = merged.top(2)
+    assert top[0]["key"] == "x" and top[0]["count"] == 4
+    assert all(t["count"] - t["error"] <= 4 for t in top)
+
+
+def test_get_top_matches_exact(db_session):
+    base = datetime(2024, 1, 1, 10, 0, 0)
+    pages = ["/home"] * 5 + ["/cart"] * 3 + ["/about"]
+    db_session.add_all([
+        Activity(user_id=str(i % 2), event_type="page_view", page=p, created_at=base + timedelta(minutes=20 * i))
+        for i, p in enumerate(pages)
+    ])
+    db_session.commit()
+
+    end = base + timedelta(hours=4)
+    sketch = topk_service.get_top(db_session, "page", start=base, end=end, k=3)
+    exact = topk_service.get_top(db_session, "page", start=base, end=end, k=3, exact=True)
+
+    assert [(i["key"], i["count"]) for i in sketch["items"]] == [("/home", 5), ("/cart", 3), ("/about", 1)]
+    assert [(i["key"], i["count"]) for i in exact["items"]] == [("/home", 5), ("/cart", 3), ("/about", 1)]
+
+
+def test_ingest_updates_loaded_buckets(db_session):
+    base = datetime(2024, 1, 1, 10, 0, 0)
+    end = base + timedelta(hours=1)
+    assert topk_service.get_top(db_session, "event_type", start=base, end=end)["items"] == []
+
+    activity_service.track_activity(db_session, TrackActivityRequest(
+        user_id="1", event_type="purchase", timestamp=base + timedelta(minutes=5)
+    ))
+
+    items = topk_service.get_top(db_session, "event_type", start=base, end=end)["items"]
+    assert [(i["key"], i["count"]) for i in items] == [("purchase", 1)]
+
+
+def test_window_longer_than_bucket_cache(db_session, monkeypatch):
+    monkeypatch.setattr(topk_service, "_MAX_BUCKETS", 48)
+    base = datetime(2024, 1, 1, 0, 0, 0)
+    db_session.add_all([
+        Activity(user_id="1", event_type="page_view", page="/old", created_at=base),
+        Activity(user_id="1", event_type="page_view", page="/new", created_at=base + timedelta(days=1, hours=23)),
+    ])
+    db_session.commit()
+
+    items = topk_service.get_top(db_session, "page", start=base, end=base + timedelta(days=2))["items"]
+    assert sorted(i["key"] for i in items) == ["/new", "/old"]
+
+    # Longer windows are refused in sketch mode, exact mode still serves them
+    with pytest.raises(ValueError):
+        topk_service.get_top(db_session, "page", start=base, end=base + timedelta(days=3))
+    exact = topk_service.get_top(db_session, "page", start=base, end=base + timedelta(days=3), exact=True)
+    assert len(exact["items"]) == 2
+
+
+def test_aware_bounds_match_naive(db_session):
+    from datetime import timezone
+    base = datetime(2024, 1, 1, 10, 0, 0)
+    db_session.add(Activity(user_id="1", event_type="page_view", page="/a", created_at=base))
+    db_session.commit()
+
+    aware = topk_service.get_top(
+        db_session, "page",
+        start=base.replace(tzinfo=timezone.utc), end=(base + timedelta(hours=1)).replace(tzinfo=timezone.utc),
+    )
+    assert [i["key"] for i in aware["items"]] == ["/a"]
+    # Aware start with a defaulted end
+    topk_service.get_top(db_session, "page", start=datetime.now(timezone.utc) - timedelta(hours=1))
+    with pytest.raises(ValueError):
+        topk_service.get_top(db_session, "page", start=base, end=base)
+
+
+@pytest.mark.parametrize("ingest_before_scan", [True, False])
+def test_ingest_during_hydration_counted_once(db_session, monkeypatch, ingest_before_scan):
+    base = datetime(2024, 1, 1, 10, 0, 0)
+    real_hydrate = topk_service._hydrate
+
+    def racing_hydrate(db, dimension, missing):
+        # The sketch is being built and not stored yet when this row arrives
+        track = lambda: activity_service.track_activity(db_session, TrackActivityRequest(
+            user_id="1", event_type="purchase", timestamp=base + timedelta(minutes=5)
+        ))
+        if ingest_before_scan:
+            track()
+        result = real_hydrate(db, dimension, missing)
+        if not ingest_before_scan:
+            track()
+        return result
+
+    monkeypatch.setattr(topk_service, "_hydrate", racing_hydrate)
+    topk_service.get_top(db_session, "event_type", start=base, end=base + timedelta(hours=1))
+    monkeypatch.setattr(topk_service, "_hydrate", real_hydrate)
+
+    items = topk_service.get_top(db_session, "event_type", start=base, end=base + timedelta(hours=1))["items"]
+    assert [(i["key"], i["count"]) for i in items] == [("purchase", 1)]
+
+
+def test_summary_top_pages_from_sketch(db_session):
+    from services import analytics_service
+    db_session.add_all([
+        Activity(user_id="1", event_type="page_view", page=p, created_at=datetime(2024, 1, 1))
+        for p in ["/home", "/home", "/cart"]
+    ])
+    db_session.commit()
+
+    assert analytics_service.get_summary(db_session)["top_pages"] == \
+        analytics_service.get_summary(db_session, exact=True)["top_pages"]
+
+    # The all-time sketch is kept current by ingest
+    activity_service.track_activity(db_session, TrackActivityRequest(user_id="2", event_type="page_view", page="/cart"))
+    activity_service.track_activity(db_session, TrackActivityRequest(user_id="2", event_type="page_view", page="/cart"))
+    top = analytics_service.get_summary(db_session)["top_pages"]
+    assert top[0] == {"page": "/cart", "count": 3}
@@ -1,5 +1,6 @@
 # app/utils/analytics_utils.py
 import json
+from datetime import datetime, timezone
 
 def parse_payload_text(payload_text: str):
     if payload_text is None:
@@ -10,3 +11,13 @@ def parse_payload_text(payload_text: str):
         return json.loads(payload_text)
     except Exception:
         return {"raw": payload_text}
+
+
+def to_naive_utc(ts: datetime):
+    """
+    Convert an aware datetime to naive UTC (how created_at is stored);
+    naive values are assumed to be UTC already.
+    """
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
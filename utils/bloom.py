@@ -0,0 +1,60 @@
+# app/utils/bloom.py
+import hashlib
+import math
+import threading
+import time
+
+
+class RotatingBloomFilter:
+    """
+    Bloom filter over recently seen keys with time-based rotation.
+
+    Two generations are kept; every `rotate_seconds` the older one is
+    dropped, so a key is remembered for between one and two rotation
+    periods and memory stays fixed. Lookups can return false positives,
+    never false negatives (for keys added within the retention window).
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.01, rotate_seconds: int = 3600):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.rotate_seconds = rotate_seconds
+        self._lock = threading.Lock()
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._rotated_at = time.monotonic()
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _maybe_rotate(self):
+        now = time.monotonic()
+        if now - self._rotated_at >= self.rotate_seconds:
+            self._previous = self._current
+            self._current = bytearray(len(self._previous))
+            self._rotated_at = now
+
+    def add(self, key: str):
+        positions = self._positions(key)
+        with self._lock:
+            self._maybe_rotate()
+            for p in positions:
+                self._current[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        with self._lock:
+            self._maybe_rotate()
+            return any(
+                all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+                for bits in (self._current, self._previous)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._current = bytearray(len(self._current))
+            self._previous = bytearray(len(self._current))
+            self._rotated_at = time.monotonic()
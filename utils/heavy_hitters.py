@@ -0,0 +1,76 @@
+# app/utils/heavy_hitters.py
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters sketch with a fixed number of counters.
+
+    Every tracked item keeps [count, error, last_seen]. `count` never
+    underestimates the true frequency and `count - error` never overestimates
+    it. Sketches with the same capacity can be merged, so per-bucket sketches
+    combine into a sketch for any window. Not thread-safe; callers that
+    share a sketch between threads must serialise access.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counters: Dict[str, list] = {}
+
+    def __len__(self):
+        return len(self.counters)
+
+    def _min_item(self):
+        return min(self.counters, key=lambda k: self.counters[k][0])
+
+    def update(self, item: str, count: int = 1, last_seen: Optional[datetime] = None):
+        entry = self.counters.get(item)
+        if entry is not None:
+            entry[0] += count
+            if last_seen is not None and (entry[2] is None or last_seen > entry[2]):
+                entry[2] = last_seen
+            return
+
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0, last_seen]
+            return
+
+        # Replace the smallest counter; its count becomes the new item's error
+        victim = self._min_item()
+        floor = self.counters.pop(victim)[0]
+        self.counters[item] = [floor + count, floor, last_seen]
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """
+        Return a new sketch covering both inputs (neither input is modified).
+        """
+        # An item missing from a full sketch may still have occurred up to
+        # that sketch's minimum count times.
+        floor_a = min((e[0] for e in self.counters.values()), default=0) if len(self) >= self.capacity else 0
+        floor_b = min((e[0] for e in other.counters.values()), default=0) if len(other) >= other.capacity else 0
+
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            a = self.counters.get(item)
+            b = other.counters.get(item)
+            count = (a[0] if a else floor_a) + (b[0] if b else floor_b)
+            error = (a[1] if a else floor_a) + (b[1] if b else floor_b)
+            seen = [e[2] for e in (a, b) if e and e[2] is not None]
+            merged[item] = [count, error, max(seen) if seen else None]
+
+        result = SpaceSaving(self.capacity)
+        top = sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[: self.capacity]
+        result.counters = {k: v for k, v in top}
+        return result
+
+    def top(self, k: int = 10) -> List[dict]:
+        ranked = sorted(
+            self.counters.items(),
+            key=lambda kv: (kv[1][0], kv[1][2] or datetime.min),
+            reverse=True,
+        )
+        return [
+            {"key": item, "count": count, "error": error, "last_seen": last_seen}
+            for item, (count, error, last_seen) in ranked[:k]
+        ]
@@ -0,0 +1,53 @@
+# app/utils/load_monitor.py
+import threading
+import time
+from collections import defaultdict
+
+
+class LoadMonitor:
+    """
+    Cheap load signals used for shedding: a moving average of how long
+    requests wait for a DB connection, and in-flight requests per route class.
+
+    The pool-wait average also decays with elapsed time (halving every
+    `half_life` seconds). Shed requests never check out a connection, so
+    without the decay a spike would keep the API shedding forever.
+    """
+
+    def __init__(self, alpha: float = 0.2, half_life: float = 5.0, clock=time.monotonic):
+        self.alpha = alpha
+        self.half_life = half_life
+        self._clock = clock
+        self._pool_wait = 0.0
+        self._updated_at = clock()
+        self._in_flight = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _decayed(self, now: float) -> float:
+        return self._pool_wait * 0.5 ** ((now - self._updated_at) / self.half_life)
+
+    @property
+    def pool_wait(self) -> float:
+        with self._lock:
+            return self._decayed(self._clock())
+
+    def record_pool_wait(self, seconds: float):
+        with self._lock:
+            now = self._clock()
+            current = self._decayed(now)
+            self._pool_wait = current + self.alpha * (seconds - current)
+            self._updated_at = now
+
+    def enter(self, route_class: str):
+        with self._lock:
+            self._in_flight[route_class] += 1
+
+    def leave(self, route_class: str):
+        with self._lock:
+            self._in_flight[route_class] -= 1
+
+    def in_flight(self, route_class: str) -> int:
+        return self._in_flight[route_class]
+
+
+load_monitor = LoadMonitor()
@@ -0,0 +1,47 @@
+# app/utils/rate_limiter.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets: `rate` tokens per second, up to `burst` stored.
+
+    Each active key costs one [tokens, updated_at] entry. Keys are kept in
+    LRU order and the least recently seen ones are evicted beyond
+    `max_keys`; an evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def acquire(self, key: str, now: float = None):
+        """
+        Take one token for `key`. Returns (allowed, retry_after_seconds).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0
+            return False, max(1, math.ceil((1 - bucket[0]) / self.rate))